@@ -1,5 +1,6 @@
 from fastapi import FastAPI, Request, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from twilio.rest import Client
 from twilio.request_validator import RequestValidator
@@ -7,10 +8,13 @@ import openai
 from datetime import datetime
 import os
 from dotenv import load_dotenv
-from models import Base, Appointment, engine, SessionLocal
-from transformers import pipeline
+from models import Base, Appointment, ChatHistory, engine, SessionLocal, upgrade_schema
 import json
 from mpesa_integration import MpesaAPI
+from chat_completion import ChatCompletionClient
+from knowledge_index import MedicalKnowledgeIndex
+from serving import load_medical_qa_pipeline
+from scheduling import SchedulingService, utc_to_local
 
 # Load environment variables
 load_dotenv()
@@ -27,8 +31,15 @@ openai.api_key = os.getenv('OPENAI_API_KEY')
 # Initialize M-PESA
 mpesa = MpesaAPI()
 
+# Initialize the general conversation layer and its retrieval index
+chat_client = ChatCompletionClient()
+knowledge_index = MedicalKnowledgeIndex()
+
+# Initialize appointment scheduling
+scheduler = SchedulingService(session_factory=SessionLocal)
+
 # Initialize the medical QA model
-medical_qa = pipeline('question-answering', model='microsoft/BiomedNLP-PubMedBERT-base-uncased-abstract-fulltext')
+medical_qa = load_medical_qa_pipeline()
 
 # Database dependency
 def get_db():
@@ -40,8 +51,9 @@ def get_db():
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
 
-def validate_twilio_request(request: Request):
+async def validate_twilio_request(request: Request):
     validator = RequestValidator(os.getenv('TWILIO_AUTH_TOKEN'))
     form_data = await request.form()
     signature = request.headers.get('X-Twilio-Signature', '')
@@ -54,10 +66,84 @@ def process_medical_query(query: str):
     result = medical_qa(question=query, context=context)
     return result['answer']
 
+def send_whatsapp_message(body: str, to: str):
+    twilio_client.messages.create(
+        body=body,
+        from_=os.getenv('TWILIO_PHONE_NUMBER'),
+        to=to
+    )
+
+def process_general_query(query: str, sender: str, db: Session):
+    """
+    Answer a general message with OpenAI, forwarding each completed paragraph
+    to WhatsApp as soon as it has streamed in. Returns the unsent remainder.
+    """
+    history = chat_client.load_history(db, sender)
+    contexts = knowledge_index.search(query)
+    buffer = []
+
+    def forward_paragraphs(delta: str):
+        buffer.append(delta)
+        text = "".join(buffer)
+        if "\n\n" in text:
+            ready, rest = text.rsplit("\n\n", 1)
+            if ready.strip():
+                send_whatsapp_message(ready.strip(), sender)
+            buffer[:] = [rest]
+
+    result = chat_client.complete(query, history, contexts, on_chunk=forward_paragraphs)
+
+    db.add(ChatHistory(
+        user_phone=sender,
+        message=query,
+        response=result['content'],
+        message_type='general',
+        prompt_tokens=result['prompt_tokens'],
+        completion_tokens=result['completion_tokens'],
+        latency_ms=result['latency_ms']
+    ))
+    db.commit()
+
+    return "".join(buffer).strip()
+
+def format_slot_suggestions(suggestions):
+    lines = [
+        f"{i}. {utc_to_local(s['start_time']).strftime('%a %d %b %H:%M')} (code {s['slot_id']})"
+        for i, s in enumerate(suggestions, 1)
+    ]
+    return "\n".join(lines) + "\nReply 'book <code>' to reserve a slot."
+
+def book_appointment_slot(slot_code: str, sender: str, db: Session):
+    """Reserve a slot for the sender's most recent paid, unscheduled appointment"""
+    phone_number = sender.replace('whatsapp:', '').replace('+', '')
+    appointment = (
+        db.query(Appointment)
+        .filter(Appointment.user_phone == phone_number,
+                Appointment.payment_status == 'completed',
+                Appointment.appointment_date.is_(None))
+        .order_by(Appointment.created_at.desc())
+        .first()
+    )
+    if appointment is None:
+        return "We couldn't find a paid appointment to schedule. Send 'appointment' to book one."
+    if not slot_code.isdigit():
+        return "Please reply with 'book' followed by one of the slot codes we sent you."
+
+    result = scheduler.reserve(db, int(slot_code), appointment)
+    if result['status'] == 'success':
+        return f"Your appointment is booked for {utc_to_local(result['start_time']).strftime('%a %d %b %H:%M')}."
+    if result['status'] == 'already_scheduled':
+        return "Your appointment has already been scheduled."
+
+    suggestions = scheduler.suggest_slots(db)
+    if not suggestions:
+        return "Sorry, that slot was just taken and there are no other open slots. We'll contact you to schedule."
+    return "Sorry, that slot was just taken. Other available slots:\n" + format_slot_suggestions(suggestions)
+
 @app.post("/webhook")
 async def webhook_handler(request: Request, db: Session = Depends(get_db)):
     # Validate the request is from Twilio
-    if not validate_twilio_request(request):
+    if not await validate_twilio_request(request):
         raise HTTPException(status_code=400, detail="Invalid Twilio signature")
 
     form_data = await request.form()
@@ -68,7 +154,10 @@ async def webhook_handler(request: Request, db: Session = Depends(get_db)):
     response = ""
 
     try:
-        if "appointment" in incoming_msg:
+        if incoming_msg.startswith("book "):
+            response = book_appointment_slot(incoming_msg[len("book "):].strip(), sender, db)
+
+        elif "appointment" in incoming_msg:
             # Format phone number for M-PESA (remove WhatsApp prefix and format for Kenyan number)
             phone_number = sender.replace('whatsapp:', '').replace('+', '')
             if phone_number.startswith('254'):
@@ -104,22 +193,13 @@ async def webhook_handler(request: Request, db: Session = Depends(get_db)):
             response = process_medical_query(incoming_msg)
         
         else:
-            # Use OpenAI for general conversation
-            completion = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a helpful medical assistant."},
-                    {"role": "user", "content": incoming_msg}
-                ]
-            )
-            response = completion.choices[0].message.content
+            # Use OpenAI for general conversation; the stream and the sends it
+            # triggers are blocking, so keep them off the event loop
+            response = await run_in_threadpool(process_general_query, incoming_msg, sender, db)
 
         # Send response via Twilio
-        twilio_client.messages.create(
-            body=response,
-            from_=os.getenv('TWILIO_PHONE_NUMBER'),
-            to=sender
-        )
+        if response:
+            send_whatsapp_message(response, sender)
 
         return {"status": "success"}
 
@@ -143,12 +223,13 @@ async def mpesa_callback(request: Request, db: Session = Depends(get_db)):
             db.add(new_appointment)
             db.commit()
 
-            # Send confirmation message via WhatsApp
-            twilio_client.messages.create(
-                body="Your payment has been confirmed! Please reply with your preferred appointment date and time.",
-                from_=os.getenv('TWILIO_PHONE_NUMBER'),
-                to=f"whatsapp:+{new_appointment.user_phone}"
-            )
+            # Send confirmation message with the next available slots via WhatsApp
+            suggestions = scheduler.suggest_slots(db)
+            if suggestions:
+                body = "Your payment has been confirmed! Available appointment slots:\n" + format_slot_suggestions(suggestions)
+            else:
+                body = "Your payment has been confirmed! We'll contact you shortly to schedule your appointment."
+            send_whatsapp_message(body, f"whatsapp:+{new_appointment.user_phone}")
 
         return {"status": "success", "message": result['message']}
 
@@ -156,5 +237,7 @@ async def mpesa_callback(request: Request, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail=str(e))
 
 if __name__ == "__main__":
+    # Single process; for multiple workers sharing one model copy use
+    # gunicorn -c gunicorn.conf.py app:app
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
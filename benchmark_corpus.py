@@ -0,0 +1,102 @@
+"""
+Benchmark load time and peak memory of the indented JSON dataset against the
+sharded JSONL corpus, on a synthetic corpus built from medical_qa_data.json.
+
+Usage:
+    python benchmark_corpus.py --pairs 100000 200000
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from qa_corpus import QACorpus
+
+def synthetic_pairs(seed_pairs, count):
+    for i in range(count):
+        pair = seed_pairs[i % len(seed_pairs)]
+        yield {
+            "question": f"{pair['question']} ({i})",
+            "context": pair['context'],
+            "answer": pair['answer'],
+        }
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pairs', type=int, nargs='+', default=[100000])
+    parser.add_argument('--lookups', type=int, default=1000)
+    args = parser.parse_args()
+
+    with open(os.path.join('medical_data', 'medical_qa_data.json'), 'r', encoding='utf-8') as f:
+        seed_pairs = [pair for pairs in json.load(f).values() for pair in pairs]
+
+    print(f"{'pairs':>8} {'operation':<28} {'time':>9} {'peak mem':>10}")
+    for count in args.pairs:
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = os.path.join(tmp, 'medical_qa_dataset.json')
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump(list(synthetic_pairs(seed_pairs, count)), f, indent=2, ensure_ascii=False)
+            corpus_dir = os.path.join(tmp, 'corpus')
+            QACorpus(corpus_dir, max_shard_bytes=16 * 1024 * 1024).append(
+                synthetic_pairs(seed_pairs, count), deduplicate=False
+            )
+            positions = [random.randrange(count) for _ in range(args.lookups)]
+            extra = list(synthetic_pairs(seed_pairs, count + 1000))[count:]
+
+            def json_load():
+                with open(json_path, 'r', encoding='utf-8') as f:
+                    json.load(f)
+
+            def json_lookups():
+                with open(json_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                for i in positions:
+                    data[i]
+
+            def json_append():
+                with open(json_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                data.extend(extra)
+                with open(json_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=2, ensure_ascii=False)
+
+            def corpus_stream():
+                corpus = QACorpus(corpus_dir)
+                for _ in corpus:
+                    pass
+                corpus.close()
+
+            def corpus_lookups():
+                corpus = QACorpus(corpus_dir)
+                for i in positions:
+                    corpus[i]
+                corpus.close()
+
+            def corpus_append():
+                QACorpus(corpus_dir).append(extra, deduplicate=False)
+
+            results = [
+                ("json: full load", json_load),
+                ("corpus: stream all", corpus_stream),
+                (f"json: load + {args.lookups} lookups", json_lookups),
+                (f"corpus: {args.lookups} mmap lookups", corpus_lookups),
+                ("json: append 1000 (rewrite)", json_append),
+                ("corpus: append 1000", corpus_append),
+            ]
+            for name, fn in results:
+                elapsed, peak = measure(fn)
+                print(f"{count:>8} {name:<28} {elapsed:>8.3f}s {peak:>8.1f}MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark memory per worker and aggregate QA throughput against worker count.
+
+The model is loaded once and workers are forked from this process, mirroring
+the gunicorn preload deployment. Linux only (reads /proc/<pid>/smaps_rollup).
+
+Usage:
+    python benchmark_workers.py --workers 1 2 4 --duration 30
+"""
+import os
+import time
+import argparse
+import multiprocessing
+from typing import Dict
+from serving import MODEL_NAME, load_medical_qa_pipeline, prepare_for_fork, configure_worker, threads_per_worker
+from knowledge_index import MedicalKnowledgeIndex
+
+medical_qa = None
+samples = []
+
+def read_memory_kb(pid: int) -> Dict[str, int]:
+    """RSS and PSS (shared pages divided among the processes using them) in kB"""
+    memory = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in ('Rss', 'Pss'):
+                memory[key] = int(value.split()[0])
+    return memory
+
+def _worker(workers: int, warmup: float, duration: float, results):
+    configure_worker(workers)
+    start = time.monotonic()
+    measure_from = start + warmup
+    deadline = measure_from + duration
+    completed = 0
+    i = 0
+    while True:
+        now = time.monotonic()
+        if now >= deadline:
+            break
+        sample = samples[i % len(samples)]
+        medical_qa(question=sample['question'], context=sample['context'])
+        if now >= measure_from:
+            completed += 1
+        i += 1
+    results.put(completed)
+
+def run(workers: int, warmup: float, duration: float) -> Dict:
+    ctx = multiprocessing.get_context('fork')
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=_worker, args=(workers, warmup, duration, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    # Sample memory once every worker has warmed up and is serving requests
+    time.sleep(warmup + duration / 2)
+    memory = [read_memory_kb(process.pid) for process in processes]
+    completed = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+
+    return {
+        "workers": workers,
+        "threads": threads_per_worker(workers),
+        "rss_mb": sum(m['Rss'] for m in memory) / len(memory) / 1024,
+        "pss_mb": sum(m['Pss'] for m in memory) / len(memory) / 1024,
+        "total_pss_mb": (sum(m['Pss'] for m in memory) + read_memory_kb(os.getpid())['Pss']) / 1024,
+        "throughput": completed / duration,
+    }
+
+def main():
+    global medical_qa, samples
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--warmup', type=float, default=5.0)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--model', default=MODEL_NAME, help="Model name or local path")
+    args = parser.parse_args()
+
+    samples = MedicalKnowledgeIndex().entries
+    medical_qa = load_medical_qa_pipeline(args.model)
+    prepare_for_fork()
+
+    print(f"{'workers':>7} {'threads':>7} {'RSS/worker':>11} {'PSS/worker':>11} {'total PSS':>10} {'req/s':>8}")
+    for workers in args.workers:
+        r = run(workers, args.warmup, args.duration)
+        print(
+            f"{r['workers']:>7} {r['threads']:>7} {r['rss_mb']:>9.0f}MB {r['pss_mb']:>9.0f}MB "
+            f"{r['total_pss_mb']:>8.0f}MB {r['throughput']:>8.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import time
+import logging
+from functools import lru_cache
+from typing import List, Dict, Optional, Callable
+import openai
+
+try:
+    import tiktoken
+except ImportError:  # Fall back to a character heuristic when tiktoken is unavailable
+    tiktoken = None
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+SYSTEM_PROMPT = "You are a helpful medical assistant."
+
+# Fixed overhead per chat message and for priming the assistant reply (gpt-3.5-turbo format)
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 2
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = DEFAULT_MODEL):
+    """Load the tokenizer for a model once per process"""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    encoding = get_encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+def count_message_tokens(messages: List[Dict], model: str = DEFAULT_MODEL) -> int:
+    total = TOKENS_PER_REPLY
+    for message in messages:
+        total += TOKENS_PER_MESSAGE + count_tokens(message['content'], model)
+    return total
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = DEFAULT_MODEL) -> str:
+    """Cut text down to at most max_tokens tokens"""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    encoding = get_encoding(model)
+    if encoding is None:
+        return text[:max_tokens * 4]
+    return encoding.decode(encoding.encode(text)[:max_tokens])
+
+class ChatCompletionClient:
+    """
+    Builds chat prompts from recent conversation turns and retrieved medical
+    contexts within a token budget, and streams completions from OpenAI.
+
+    Prompt space is filled by priority: system prompt and the current message
+    first, then retrieved contexts (up to max_context_tokens), then history
+    turns from newest to oldest until the budget is used up.
+    """
+
+    def __init__(
+        self,
+        model: str = DEFAULT_MODEL,
+        system_prompt: str = SYSTEM_PROMPT,
+        max_prompt_tokens: int = 3000,
+        max_context_tokens: int = 1000,
+        max_completion_tokens: int = 512,
+        history_turns: int = 10,
+    ):
+        self.model = model
+        self.system_prompt = system_prompt
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_context_tokens = max_context_tokens
+        self.max_completion_tokens = max_completion_tokens
+        self.history_turns = history_turns
+
+    def load_history(self, db, user_phone: str) -> List:
+        """Fetch the most recent chat turns for a user, newest first"""
+        from models import ChatHistory
+
+        return (
+            db.query(ChatHistory)
+            .filter(ChatHistory.user_phone == user_phone)
+            .order_by(ChatHistory.timestamp.desc())
+            .limit(self.history_turns)
+            .all()
+        )
+
+    def build_messages(self, query: str, history: List = (), contexts: List[str] = ()) -> List[Dict]:
+        """
+        Assemble the message list for a completion request
+
+        Args:
+            query (str): The current user message
+            history (list): ChatHistory rows, newest first
+            contexts (list): Retrieved medical contexts, most relevant first
+        """
+        budget = self.max_prompt_tokens - TOKENS_PER_REPLY
+
+        # The system prompt is always sent; the user message is truncated if it alone overflows
+        budget -= TOKENS_PER_MESSAGE + count_tokens(self.system_prompt, self.model)
+        query = truncate_to_tokens(query, budget - TOKENS_PER_MESSAGE, self.model)
+        budget -= TOKENS_PER_MESSAGE + count_tokens(query, self.model)
+
+        system_content = self.system_prompt
+        header = "\n\nRelevant medical information:"
+        # The header is only sent with at least one context, but must fit in the same budget
+        context_budget = min(budget, self.max_context_tokens) - count_tokens(header, self.model)
+        selected_contexts = []
+        for context in contexts:
+            # Each context is joined as "\n- <context>"
+            available = context_budget - count_tokens("\n- ", self.model)
+            if available <= 0:
+                break
+            context = truncate_to_tokens(context, available, self.model)
+            selected_contexts.append(context)
+            context_budget = available - count_tokens(context, self.model)
+        if selected_contexts:
+            system_content += header + "".join(f"\n- {c}" for c in selected_contexts)
+            budget -= (
+                count_tokens(system_content, self.model)
+                - count_tokens(self.system_prompt, self.model)
+            )
+
+        turns = []
+        for entry in history:
+            turn = [
+                {"role": "user", "content": entry.message or ""},
+                {"role": "assistant", "content": entry.response or ""},
+            ]
+            cost = sum(TOKENS_PER_MESSAGE + count_tokens(m['content'], self.model) for m in turn)
+            if cost > budget:
+                break
+            budget -= cost
+            turns.append(turn)
+
+        messages = [{"role": "system", "content": system_content}]
+        for turn in reversed(turns):
+            messages.extend(turn)
+        messages.append({"role": "user", "content": query})
+        return messages
+
+    def complete(
+        self,
+        query: str,
+        history: List = (),
+        contexts: List[str] = (),
+        on_chunk: Optional[Callable[[str], None]] = None,
+    ) -> Dict:
+        """
+        Stream a chat completion and return the full response with usage stats
+
+        Args:
+            query (str): The current user message
+            history (list): ChatHistory rows, newest first
+            contexts (list): Retrieved medical contexts, most relevant first
+            on_chunk (callable): Called with each content delta as it arrives
+        """
+        messages = self.build_messages(query, history, contexts)
+        prompt_tokens = count_message_tokens(messages, self.model)
+
+        start = time.monotonic()
+        first_chunk_at = None
+        parts = []
+        stream = openai.ChatCompletion.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=self.max_completion_tokens,
+            stream=True,
+        )
+        for chunk in stream:
+            delta = chunk.choices[0].delta.get('content')
+            if not delta:
+                continue
+            if first_chunk_at is None:
+                first_chunk_at = time.monotonic()
+            parts.append(delta)
+            if on_chunk is not None:
+                on_chunk(delta)
+        end = time.monotonic()
+
+        content = "".join(parts)
+        result = {
+            "content": content,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": count_tokens(content, self.model) if content else 0,
+            "first_chunk_ms": int((first_chunk_at - start) * 1000) if first_chunk_at else None,
+            "latency_ms": int((end - start) * 1000),
+        }
+        logging.info(
+            f"Chat completion: {result['prompt_tokens']} prompt tokens, "
+            f"{result['completion_tokens']} completion tokens, "
+            f"first chunk {result['first_chunk_ms']} ms, total {result['latency_ms']} ms"
+        )
+        return result
@@ -0,0 +1,29 @@
+import os
+import multiprocessing
+
+# Multi-worker deployment: gunicorn -c gunicorn.conf.py app:app
+#
+# The app (and with it the PubMedBERT weights) is imported once in the master
+# and workers are forked from it, so the model memory is shared copy-on-write
+# instead of being loaded again by every worker.
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', max(1, multiprocessing.cpu_count() // 2)))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 120
+
+def when_ready(server):
+    from serving import prepare_for_fork
+
+    prepare_for_fork()
+
+def post_fork(server, worker):
+    from serving import configure_worker
+    from models import engine
+
+    # server.cfg reflects -w/--workers overrides, the module global does not
+    configure_worker(server.cfg.workers)
+
+    # Database connections opened in the master must not be shared across processes
+    engine.dispose()
@@ -0,0 +1,90 @@
+import json
+import os
+import re
+import logging
+from collections import defaultdict
+from typing import List, Dict
+from qa_corpus import QACorpus
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Words that carry no signal when matching a user message against the corpus
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for",
+    "from", "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "should",
+    "that", "the", "this", "to", "what", "when", "which", "who", "why", "with", "you",
+}
+
+class MedicalKnowledgeIndex:
+    """
+    Small in-memory inverted index over the medical QA corpus, used to retrieve
+    contexts for the general conversation prompt.
+
+    When the sharded corpus exists only the postings are held in memory and
+    entries are read on demand through its memory-mapped index; otherwise the
+    pairs are loaded from medical_qa_data.json. Entries passed to add() are
+    kept in memory after those loaded at startup.
+    """
+
+    def __init__(self, data_path: str = "medical_data"):
+        self.data_path = data_path
+        self.entries = []
+        self.added_entries: List[Dict] = []
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+
+        corpus = QACorpus(os.path.join(data_path, 'corpus'))
+        if len(corpus) > 0:
+            self.entries = corpus
+            for idx, entry in enumerate(corpus):
+                self._index(idx, entry)
+        else:
+            self._load()
+        self._loaded_count = len(self.entries)
+
+    @staticmethod
+    def _tokenize(text: str) -> List[str]:
+        return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+    def _load(self):
+        data_file = os.path.join(self.data_path, 'medical_qa_data.json')
+        try:
+            with open(data_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logging.error(f"Error loading knowledge index: {str(e)}")
+            return
+
+        for entries in data.values():
+            for entry in entries:
+                self._index(len(self.entries), entry)
+                self.entries.append(entry)
+
+    def add(self, entry: Dict):
+        idx = self._loaded_count + len(self.added_entries)
+        self.added_entries.append(entry)
+        self._index(idx, entry)
+
+    def _entry(self, idx: int) -> Dict:
+        if idx < self._loaded_count:
+            return self.entries[idx]
+        return self.added_entries[idx - self._loaded_count]
+
+    def _index(self, idx: int, entry: Dict):
+        for token in set(self._tokenize(f"{entry['question']} {entry['context']}")):
+            self.postings[token].append(idx)
+
+    def search(self, query: str, top_k: int = 3) -> List[str]:
+        """
+        Return the contexts of the top_k entries sharing the most terms with the query
+        """
+        scores = defaultdict(int)
+        for token in set(self._tokenize(query)):
+            for idx in self.postings.get(token, []):
+                scores[idx] += 1
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+        contexts = []
+        for idx, _ in ranked:
+            entry = self._entry(idx)
+            contexts.append(f"Q: {entry['question']}\nA: {entry['answer']}")
+        return contexts
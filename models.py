@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text
+from sqlalchemy import create_engine, inspect, text, Column, Integer, String, Float, DateTime, Text, ForeignKey, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
@@ -22,6 +22,32 @@ class Appointment(Base):
     amount_paid = Column(Float)
     created_at = Column(DateTime, default=datetime.utcnow)
     notes = Column(Text, nullable=True)
+    # Optimistic locking, so concurrent bookings cannot give one appointment two slots
+    version = Column(Integer, nullable=False)
+
+    __mapper_args__ = {"version_id_col": version}
+
+class Clinician(Base):
+    __tablename__ = "clinicians"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String)
+    specialty = Column(String, nullable=True)
+
+class AppointmentSlot(Base):
+    __tablename__ = "appointment_slots"
+    __table_args__ = (UniqueConstraint('clinician_id', 'start_time'),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    clinician_id = Column(Integer, ForeignKey('clinicians.id'), index=True)
+    start_time = Column(DateTime, index=True)
+    end_time = Column(DateTime)
+    status = Column(String, default='free', index=True)  # can be 'free' or 'booked'
+    appointment_id = Column(Integer, ForeignKey('appointments.id'), nullable=True)
+    # Optimistic locking: updates only apply if the row is still at the version that was read
+    version = Column(Integer, nullable=False)
+
+    __mapper_args__ = {"version_id_col": version}
 
 class ChatHistory(Base):
     __tablename__ = "chat_history"
@@ -32,3 +58,30 @@ class ChatHistory(Base):
     response = Column(Text)
     timestamp = Column(DateTime, default=datetime.utcnow)
     message_type = Column(String)  # can be 'appointment', 'medical_query', or 'general'
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    latency_ms = Column(Integer, nullable=True)
+
+# Columns added after their table was first released. create_all does not alter
+# existing tables, so upgrade_schema adds any that an older database is missing.
+ADDED_COLUMNS = {
+    "appointments": {
+        "version": "INTEGER NOT NULL DEFAULT 1",
+    },
+    "chat_history": {
+        "prompt_tokens": "INTEGER",
+        "completion_tokens": "INTEGER",
+        "latency_ms": "INTEGER",
+    },
+}
+
+def upgrade_schema(engine):
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table, columns in ADDED_COLUMNS.items():
+            if not inspector.has_table(table):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table)}
+            for name, column_type in columns.items():
+                if name not in existing:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}"))
@@ -1,7 +1,7 @@
 import pandas as pd
 import json
 import os
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator
 import requests
 from bs4 import BeautifulSoup
 import re
@@ -9,6 +9,8 @@ import time
 from concurrent.futures import ThreadPoolExecutor
 import logging
 from urllib.parse import urljoin
+from qa_corpus import QACorpus
+from text_ingestion import TextIngestor
 
 class MedicalDataCollector:
     def __init__(self, output_dir: str = "medical_data"):
@@ -35,23 +37,21 @@ class MedicalDataCollector:
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
 
-    def collect_medical_data(self) -> List[Dict]:
+    def collect_medical_data(self) -> Iterator[Dict]:
         """
         Collect medical data from various sources and format it for training.
         You can implement multiple data collection methods here.
+        Pairs are yielded as they are produced so large text folders can be
+        streamed into the corpus without being held in memory.
         """
-        medical_qa_pairs = []
-        
         # Method 1: Load from structured medical datasets
-        medical_qa_pairs.extend(self._load_structured_data())
+        yield from self._load_structured_data()
         
         # Method 2: Scrape from medical websites (implement with proper permissions)
-        medical_qa_pairs.extend(self._scrape_medical_websites())
+        yield from self._scrape_medical_websites()
         
         # Method 3: Load from local medical text files
-        medical_qa_pairs.extend(self._load_local_medical_texts())
-        
-        return medical_qa_pairs
+        yield from self._load_local_medical_texts()
 
     def _load_structured_data(self) -> List[Dict]:
         """
@@ -177,26 +177,19 @@ class MedicalDataCollector:
             
         return qa_pairs
 
-    def _load_local_medical_texts(self) -> List[Dict]:
+    def _load_local_medical_texts(self) -> Iterator[Dict]:
         """
         Load and process local medical text files
         """
-        qa_pairs = []
-        
         # Load pre-defined medical QA dataset
-        medical_qa_data = self._load_medical_qa_dataset()
-        qa_pairs.extend(medical_qa_data)
-        
-        # Process medical text files in the data directory
-        text_files_dir = os.path.join(self.output_dir, 'text_files')
-        if os.path.exists(text_files_dir):
-            for filename in os.listdir(text_files_dir):
-                if filename.endswith('.txt'):
-                    file_path = os.path.join(text_files_dir, filename)
-                    file_qa_pairs = self._process_medical_text_file(file_path)
-                    qa_pairs.extend(file_qa_pairs)
+        yield from self._load_medical_qa_dataset()
         
-        return qa_pairs
+        # Process new or changed medical text files in the data directory in parallel
+        ingestor = TextIngestor(
+            text_dir=os.path.join(self.output_dir, 'text_files'),
+            manifest_path=os.path.join(self.output_dir, 'text_ingest_manifest.json')
+        )
+        yield from ingestor.ingest()
 
     def _load_medical_qa_dataset(self) -> List[Dict]:
         """
@@ -230,35 +223,6 @@ class MedicalDataCollector:
         
         return qa_pairs
 
-    def _process_medical_text_file(self, file_path: str) -> List[Dict]:
-        """
-        Process a medical text file and extract QA pairs
-        """
-        qa_pairs = []
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                
-            # Split content into sections (this is a simple implementation)
-            sections = content.split('\n\n')
-            
-            for section in sections:
-                if len(section.strip()) > 0:
-                    # Create a question from the first sentence
-                    sentences = section.split('.')
-                    if len(sentences) > 1:
-                        question = f"What is described in this medical text: {sentences[0].strip()}?"
-                        qa_pairs.append({
-                            "question": question,
-                            "context": section.strip(),
-                            "answer": section.strip()
-                        })
-                        
-        except Exception as e:
-            logging.error(f"Error processing file {file_path}: {str(e)}")
-            
-        return qa_pairs
-
     def _save_intermediate_results(self, data: List[Dict], filename: str):
         """
         Save intermediate results to avoid losing data in case of errors
@@ -275,6 +239,14 @@ class MedicalDataCollector:
         with open(output_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
 
+    def append_to_corpus(self, data: Iterable[Dict]) -> int:
+        """
+        Append collected data to the sharded JSONL corpus, skipping pairs that
+        are already in it. Returns the number of new pairs written.
+        """
+        corpus = QACorpus(os.path.join(self.output_dir, 'corpus'))
+        return corpus.append(data)
+
 def main():
     # Initialize collector
     collector = MedicalDataCollector()
@@ -282,10 +254,10 @@ def main():
     # Collect medical data
     medical_qa_pairs = collector.collect_medical_data()
     
-    # Save to file
-    collector.save_to_file(medical_qa_pairs)
+    # Stream new pairs into the corpus
+    new_pairs = collector.append_to_corpus(medical_qa_pairs)
     
-    print(f"Collected {len(medical_qa_pairs)} medical Q&A pairs")
+    print(f"Added {new_pairs} new medical Q&A pairs to the corpus")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,205 @@
+import os
+import json
+import mmap
+import glob
+import hashlib
+import logging
+from array import array
+from typing import List, Dict, Iterable, Iterator
+
+DEFAULT_SHARD_BYTES = 64 * 1024 * 1024
+
+def record_hash(record: Dict) -> str:
+    """Content hash of a QA pair, independent of key order and extra fields"""
+    key = json.dumps([record['question'], record['context'], record['answer']], ensure_ascii=False)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+class QACorpus:
+    """
+    Append-only QA corpus stored as JSONL shards.
+
+    Each shard-NNNNN.jsonl has a shard-NNNNN.idx companion holding the byte
+    offset of every record as little-endian uint64, so records can be counted
+    and fetched by position through mmap without parsing the whole shard.
+    Bytes past the last indexed record are not part of the corpus. hashes.txt
+    holds the content hash of every record, for deduplication on append.
+    """
+
+    def __init__(self, corpus_dir: str = os.path.join("medical_data", "corpus"),
+                 max_shard_bytes: int = DEFAULT_SHARD_BYTES):
+        self.corpus_dir = corpus_dir
+        self.max_shard_bytes = max_shard_bytes
+        self._readers = {}
+        self._counts = None
+        self._hashes = None
+
+    def shard_paths(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.corpus_dir, 'shard-*.jsonl')))
+
+    @staticmethod
+    def _index_path(shard_path: str) -> str:
+        return shard_path[:-len('.jsonl')] + '.idx'
+
+    def _shard_counts(self) -> List[int]:
+        if self._counts is None:
+            self._counts = []
+            for shard_path in self.shard_paths():
+                index_path = self._index_path(shard_path)
+                size = os.path.getsize(index_path) if os.path.exists(index_path) else 0
+                self._counts.append(size // 8)
+        return self._counts
+
+    def __len__(self) -> int:
+        return sum(self._shard_counts())
+
+    def _reader(self, shard_no: int):
+        if shard_no not in self._readers:
+            shard_path = self.shard_paths()[shard_no]
+            offsets = array('Q')
+            with open(self._index_path(shard_path), 'rb') as f:
+                offsets.frombytes(f.read(self._shard_counts()[shard_no] * 8))
+            with open(shard_path, 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._readers[shard_no] = (data, offsets)
+        return self._readers[shard_no]
+
+    def _read(self, shard_no: int, position: int) -> Dict:
+        data, offsets = self._reader(shard_no)
+        start = offsets[position]
+        end = data.find(b'\n', start)
+        return json.loads(data[start:end if end != -1 else len(data)])
+
+    def __getitem__(self, i: int) -> Dict:
+        if i < 0:
+            i += len(self)
+        for shard_no, count in enumerate(self._shard_counts()):
+            if i < count:
+                return self._read(shard_no, i)
+            i -= count
+        raise IndexError("corpus index out of range")
+
+    def __iter__(self) -> Iterator[Dict]:
+        for shard_no, count in enumerate(self._shard_counts()):
+            for position in range(count):
+                yield self._read(shard_no, position)
+
+    def close(self):
+        for data, _ in self._readers.values():
+            data.close()
+        self._readers = {}
+
+    def _hashes_path(self) -> str:
+        return os.path.join(self.corpus_dir, 'hashes.txt')
+
+    def _load_hashes(self) -> set:
+        """
+        Read the content hashes of all indexed records from the hashes.txt
+        sidecar, rebuilding it from the shards if it is missing or out of step
+        """
+        hashes_path = self._hashes_path()
+        if os.path.exists(hashes_path):
+            with open(hashes_path, 'r', encoding='ascii') as f:
+                lines = f.read().split()
+            if len(lines) == len(self):
+                return set(lines)
+
+        hashes = [record_hash(record) for record in self]
+        with open(hashes_path, 'w', encoding='ascii') as f:
+            f.write("".join(f"{digest}\n" for digest in hashes))
+        return set(hashes)
+
+    def _truncate_unindexed_tail(self, shard_path: str):
+        """
+        Cut the shard back to the end of its last indexed record, dropping any
+        partial line or index entry left by an interrupted append
+        """
+        index_path = self._index_path(shard_path)
+        count = os.path.getsize(index_path) // 8 if os.path.exists(index_path) else 0
+        end = 0
+        if count:
+            with open(index_path, 'rb') as f:
+                f.seek((count - 1) * 8)
+                last_offset = array('Q', f.read(8))[0]
+            with open(shard_path, 'rb') as f:
+                f.seek(last_offset)
+                end = last_offset + len(f.readline())
+        with open(index_path, 'ab') as f:
+            f.truncate(count * 8)
+        if os.path.getsize(shard_path) > end:
+            with open(shard_path, 'ab') as f:
+                f.truncate(end)
+
+    def append(self, records: Iterable[Dict], deduplicate: bool = True) -> int:
+        """
+        Append records to the last shard, starting a new shard when it grows past
+        max_shard_bytes. Returns the number of records written.
+        """
+        os.makedirs(self.corpus_dir, exist_ok=True)
+        self.close()
+
+        shard_paths = self.shard_paths()
+        shard_path = shard_paths[-1] if shard_paths else os.path.join(self.corpus_dir, 'shard-00000.jsonl')
+        shard_no = len(shard_paths) - 1 if shard_paths else 0
+        if shard_paths:
+            self._truncate_unindexed_tail(shard_path)
+            self._counts = None
+        if self._hashes is None:
+            self._hashes = self._load_hashes()
+
+        shard = open(shard_path, 'ab')
+        index = open(self._index_path(shard_path), 'ab')
+        hashes = open(self._hashes_path(), 'a', encoding='ascii')
+
+        written = 0
+        try:
+            for record in records:
+                digest = record_hash(record)
+                if deduplicate and digest in self._hashes:
+                    continue
+                self._hashes.add(digest)
+
+                if shard.tell() >= self.max_shard_bytes:
+                    shard.close()
+                    index.close()
+                    shard_no += 1
+                    shard_path = os.path.join(self.corpus_dir, f'shard-{shard_no:05d}.jsonl')
+                    shard = open(shard_path, 'ab')
+                    index = open(self._index_path(shard_path), 'ab')
+
+                # The offset is recorded only after its line is written, so a
+                # crash mid-write leaves an unindexed tail rather than a bad record
+                offset = shard.tell()
+                shard.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+                shard.flush()
+                index.write(array('Q', [offset]).tobytes())
+                index.flush()
+                hashes.write(f"{digest}\n")
+                written += 1
+        finally:
+            shard.close()
+            index.close()
+            hashes.close()
+            self._counts = None
+
+        logging.info(f"Appended {written} QA pairs to corpus at {self.corpus_dir}")
+        return written
+
+def import_json_dataset(json_path: str, corpus: QACorpus) -> int:
+    """
+    Import a JSON dataset into the corpus. Accepts either a list of QA pairs or
+    the category-keyed layout of medical_qa_data.json.
+    """
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = [pair for pairs in data.values() for pair in pairs]
+    return corpus.append(data)
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python qa_corpus.py <dataset.json> [corpus_dir]")
+        sys.exit(1)
+    target = QACorpus(*sys.argv[2:3])
+    print(f"Imported {import_json_dataset(sys.argv[1], target)} QA pairs into {target.corpus_dir}")
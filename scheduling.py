@@ -0,0 +1,240 @@
+import os
+import time
+import logging
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+from models import Appointment, AppointmentSlot, SessionLocal
+
+# Slot times are stored and compared as naive UTC. Users and clinic staff work in
+# the clinic's local time (EAT, UTC+3, by default), so convert at the edges.
+CLINIC_UTC_OFFSET = timedelta(hours=float(os.getenv('CLINIC_UTC_OFFSET_HOURS', '3')))
+
+def local_to_utc(local_time: datetime) -> datetime:
+    return local_time - CLINIC_UTC_OFFSET
+
+def utc_to_local(utc_time: datetime) -> datetime:
+    return utc_time + CLINIC_UTC_OFFSET
+
+class SlotIndex:
+    """
+    In-memory interval index of appointment slots.
+
+    Free slots are kept in lists sorted by (start_time, slot_id), overall and
+    per clinician, so the next available slots are found with a bisect. All
+    slots, free and booked, are kept per clinician sorted by start time for
+    overlap checks when new availability is added.
+    """
+
+    def __init__(self):
+        self._free: List[Tuple[datetime, int]] = []
+        self._free_by_clinician: Dict[int, List[Tuple[datetime, int]]] = defaultdict(list)
+        self._intervals: Dict[int, List[Tuple[datetime, datetime, int]]] = defaultdict(list)
+        self._slots: Dict[int, Tuple[int, datetime, datetime, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._free)
+
+    @classmethod
+    def from_slots(cls, slots) -> 'SlotIndex':
+        """Build an index from AppointmentSlot rows, sorting each list once"""
+        index = cls()
+        for slot in slots:
+            index._slots[slot.id] = (slot.clinician_id, slot.start_time, slot.end_time, slot.status)
+            index._intervals[slot.clinician_id].append((slot.start_time, slot.end_time, slot.id))
+            if slot.status == 'free':
+                index._free.append((slot.start_time, slot.id))
+                index._free_by_clinician[slot.clinician_id].append((slot.start_time, slot.id))
+        index._free.sort()
+        for items in list(index._free_by_clinician.values()) + list(index._intervals.values()):
+            items.sort()
+        return index
+
+    def add(self, slot_id: int, clinician_id: int, start_time: datetime, end_time: datetime, status: str = 'free'):
+        if slot_id in self._slots:
+            self.remove(slot_id)
+        self._slots[slot_id] = (clinician_id, start_time, end_time, status)
+        insort(self._intervals[clinician_id], (start_time, end_time, slot_id))
+        if status == 'free':
+            insort(self._free, (start_time, slot_id))
+            insort(self._free_by_clinician[clinician_id], (start_time, slot_id))
+
+    def remove(self, slot_id: int):
+        clinician_id, start_time, end_time, status = self._slots.pop(slot_id)
+        self._discard(self._intervals[clinician_id], (start_time, end_time, slot_id))
+        if status == 'free':
+            self._discard(self._free, (start_time, slot_id))
+            self._discard(self._free_by_clinician[clinician_id], (start_time, slot_id))
+
+    def mark_booked(self, slot_id: int):
+        if slot_id in self._slots:
+            clinician_id, start_time, end_time, _ = self._slots[slot_id]
+            self.add(slot_id, clinician_id, start_time, end_time, status='booked')
+
+    @staticmethod
+    def _discard(items: list, key: tuple):
+        i = bisect_left(items, key)
+        if i < len(items) and items[i] == key:
+            del items[i]
+
+    def next_free(self, after: datetime, n: int, clinician_id: Optional[int] = None) -> List[int]:
+        """Ids of the first n free slots starting at or after `after`"""
+        items = self._free if clinician_id is None else self._free_by_clinician.get(clinician_id, [])
+        i = bisect_left(items, (after, 0))
+        return [slot_id for _, slot_id in items[i:i + n]]
+
+    def overlaps(self, clinician_id: int, start_time: datetime, end_time: datetime) -> bool:
+        """Whether [start_time, end_time) overlaps an existing slot of the clinician"""
+        intervals = self._intervals.get(clinician_id, [])
+        i = bisect_right(intervals, (start_time, datetime.max, float('inf')))
+        # Slots are non-overlapping, so only the neighbours of the insertion point can collide
+        if i > 0 and intervals[i - 1][1] > start_time:
+            return True
+        return i < len(intervals) and intervals[i][0] < end_time
+
+    def get(self, slot_id: int) -> Optional[Tuple[int, datetime, datetime, str]]:
+        return self._slots.get(slot_id)
+
+class SchedulingService:
+    """
+    Suggests and reserves appointment slots.
+
+    Lookups are served from a per-process SlotIndex. It is loaded once per
+    process on first use and then rebuilt every refresh_interval seconds by a
+    background thread, so requests never wait on a full slot scan.
+    Reservations are checked against the database with optimistic locking on
+    AppointmentSlot.version and Appointment.version, so two workers holding
+    the same stale suggestion cannot both book it, and one appointment cannot
+    be given two slots.
+
+    All times are naive UTC; see local_to_utc and utc_to_local.
+    """
+
+    def __init__(self, refresh_interval: float = 60.0, session_factory=SessionLocal):
+        self.refresh_interval = refresh_interval
+        self.session_factory = session_factory
+        self.index = SlotIndex()
+        self._lock = threading.Lock()
+        self._loaded_pid = None
+
+    def _load_index(self, db: Session) -> SlotIndex:
+        slots = db.query(AppointmentSlot).filter(AppointmentSlot.end_time > datetime.utcnow())
+        return SlotIndex.from_slots(slots)
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            db = self.session_factory()
+            try:
+                index = self._load_index(db)
+                with self._lock:
+                    self.index = index
+            except Exception as e:
+                logging.error(f"Error refreshing slot index: {str(e)}")
+            finally:
+                db.close()
+
+    def _ensure_index(self, db: Session):
+        # Threads do not survive a fork, so each worker process loads and refreshes its own index
+        if self._loaded_pid == os.getpid():
+            return
+        with self._lock:
+            if self._loaded_pid == os.getpid():
+                return
+            self.index = self._load_index(db)
+            self._loaded_pid = os.getpid()
+        threading.Thread(target=self._refresh_loop, daemon=True).start()
+
+    def create_slots(self, db: Session, clinician_id: int, start_time: datetime, end_time: datetime,
+                     duration_minutes: int = 30) -> List[AppointmentSlot]:
+        """
+        Add free slots of duration_minutes covering [start_time, end_time) for a
+        clinician, skipping any that overlap existing slots. Times are UTC.
+        """
+        self._ensure_index(db)
+        duration = timedelta(minutes=duration_minutes)
+        slots = []
+        slot_start = start_time
+        with self._lock:
+            index = self.index
+        while slot_start + duration <= end_time:
+            slot_end = slot_start + duration
+            if not index.overlaps(clinician_id, slot_start, slot_end):
+                slots.append(AppointmentSlot(
+                    clinician_id=clinician_id,
+                    start_time=slot_start,
+                    end_time=slot_end,
+                    status='free'
+                ))
+            slot_start = slot_end
+        db.add_all(slots)
+        db.commit()
+        with self._lock:
+            for slot in slots:
+                self.index.add(slot.id, slot.clinician_id, slot.start_time, slot.end_time, slot.status)
+        return slots
+
+    def suggest_slots(self, db: Session, n: int = 3, after: datetime = None,
+                      clinician_id: Optional[int] = None) -> List[Dict]:
+        """Return the next n free slots starting after `after` (UTC, default now), earliest first"""
+        self._ensure_index(db)
+        suggestions = []
+        with self._lock:
+            index = self.index
+        for slot_id in index.next_free(after or datetime.utcnow(), n, clinician_id):
+            slot_clinician_id, start_time, end_time, _ = index.get(slot_id)
+            suggestions.append({
+                "slot_id": slot_id,
+                "clinician_id": slot_clinician_id,
+                "start_time": start_time,
+                "end_time": end_time
+            })
+        return suggestions
+
+    def _mark_booked(self, slot_id: int):
+        with self._lock:
+            self.index.mark_booked(slot_id)
+
+    def reserve(self, db: Session, slot_id: int, appointment: Appointment) -> Dict:
+        """
+        Book a slot for an appointment.
+
+        Returns {"status": "success"} on success, {"status": "unavailable"} if
+        the slot is taken, already started or was just booked concurrently, and
+        {"status": "already_scheduled"} if the appointment got a slot meanwhile.
+        """
+        unavailable = {"status": "unavailable", "message": "This slot is no longer available"}
+        already_scheduled = {"status": "already_scheduled", "message": "This appointment is already scheduled"}
+
+        if appointment.appointment_date is not None:
+            return already_scheduled
+        slot = db.query(AppointmentSlot).filter(AppointmentSlot.id == slot_id).first()
+        if slot is None or slot.start_time <= datetime.utcnow():
+            return unavailable
+        if slot.status != 'free':
+            self._mark_booked(slot_id)
+            return unavailable
+
+        slot.status = 'booked'
+        slot.appointment_id = appointment.id
+        appointment.appointment_date = slot.start_time
+        try:
+            # Both rows are version-checked in this transaction, so it fails as a
+            # whole if either the slot or the appointment changed since it was read
+            db.commit()
+        except StaleDataError:
+            db.rollback()
+            db.refresh(appointment)
+            if appointment.appointment_date is not None:
+                logging.info(f"Appointment {appointment.id} was scheduled concurrently")
+                return already_scheduled
+            self._mark_booked(slot_id)
+            logging.info(f"Slot {slot_id} was booked concurrently")
+            return unavailable
+
+        self._mark_booked(slot_id)
+        return {"status": "success", "message": "Appointment booked", "start_time": slot.start_time}
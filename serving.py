@@ -0,0 +1,43 @@
+import gc
+import os
+import logging
+import torch
+from transformers import pipeline
+
+MODEL_NAME = 'microsoft/BiomedNLP-PubMedBERT-base-uncased-abstract-fulltext'
+
+def load_medical_qa_pipeline(model_name: str = MODEL_NAME):
+    """
+    Load the medical QA pipeline for inference.
+
+    In multi-worker mode this runs once in the master process before workers
+    are forked, so the weights are shared copy-on-write between workers.
+    Inference must not run here, since forking after torch has started its
+    thread pool can deadlock the children.
+    """
+    medical_qa = pipeline('question-answering', model=model_name)
+    medical_qa.model.eval()
+    for param in medical_qa.model.parameters():
+        param.requires_grad_(False)
+    return medical_qa
+
+def prepare_for_fork():
+    """
+    Move everything allocated so far out of the garbage collector's reach, so
+    collections in the workers don't write to (and thereby copy) shared pages
+    """
+    gc.collect()
+    gc.freeze()
+
+def threads_per_worker(workers: int) -> int:
+    """Intra-op threads for each worker, splitting the CPU cores evenly by default"""
+    configured = os.getenv('TORCH_THREADS_PER_WORKER')
+    if configured:
+        return max(1, int(configured))
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+def configure_worker(workers: int):
+    """Tune torch threading in a freshly forked worker"""
+    threads = threads_per_worker(workers)
+    torch.set_num_threads(threads)
+    logging.info(f"Worker {os.getpid()} using {threads} torch threads")
@@ -0,0 +1,239 @@
+import os
+import re
+import json
+import hashlib
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Iterator, Tuple
+
+DEFAULT_CHUNK_BYTES = 8 * 1024 * 1024
+DEFAULT_MAX_SECTION_CHARS = 20000
+
+# Candidate sentence boundaries: terminal punctuation, optional closing quote or
+# bracket, then whitespace (so decimals like 2.5 never match)
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])(["\')\]]?)\s+(?=\S)')
+
+# Tokens ending in a period that never end a sentence
+ABBREVIATIONS = {"dr", "mr", "mrs", "ms", "prof", "st", "e.g", "i.e"}
+
+# Tokens that are abbreviations mid-sentence but also commonly end one ("5 mg.",
+# "the answer is no."); they only continue the sentence when the next word
+# starts with a lowercase letter or a digit
+AMBIGUOUS_ABBREVIATIONS = {
+    "no", "vs", "etc", "approx", "fig", "vol", "mg", "mcg", "ml", "kg", "cm", "mm",
+    "hr", "hrs", "min", "max", "avg", "dept", "inc", "jan", "feb", "mar", "apr",
+    "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+}
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences, keeping abbreviations and initials attached"""
+    sentences = []
+    current = ""
+    pos = 0
+    for match in SENTENCE_BOUNDARY.finditer(text):
+        current += text[pos:match.end(1)]
+        pos = match.end()
+        last_word = current.rsplit(None, 1)[-1].rstrip('.!?"\')]').lower() if current.strip() else ""
+        next_char = text[pos:].lstrip('"\'([')[:1]
+        continues = next_char.islower() or next_char.isdigit()
+        if (last_word in ABBREVIATIONS
+                or (last_word in AMBIGUOUS_ABBREVIATIONS and continues)
+                or (len(last_word) == 1 and last_word.isalpha())):
+            current += text[match.end(1):match.end()]
+            continue
+        sentences.append(current.strip())
+        current = ""
+    current += text[pos:]
+    if current.strip():
+        sentences.append(current.strip())
+    return sentences
+
+def section_to_qa_pair(section: str):
+    """Turn a section into a QA pair keyed on its first sentence, if it has a complete one"""
+    section = section.strip()
+    sentences = split_sentences(section)
+    if not sentences or not re.search(r'[.!?]["\')\]]?$', sentences[0]):
+        return None
+    first_sentence = sentences[0].rstrip('.!?')
+    return {
+        "question": f"What is described in this medical text: {first_sentence}?",
+        "context": section,
+        "answer": section
+    }
+
+def _read_sections(f, start: int, end: int, max_section_chars: int) -> Iterator[str]:
+    """
+    Yield the sections of an open binary file owned by the byte range [start, end).
+
+    Sections are separated by blank lines. A range owns everything from just
+    after the first blank line starting at or after `start` (or the beginning
+    of the file) up to and including the first blank line starting at or after
+    `end`, so adjacent ranges split the file exactly at section boundaries.
+    """
+    if start > 0:
+        f.seek(start - 1)
+        f.readline()
+        while True:
+            line_start = f.tell()
+            line = f.readline()
+            if not line:
+                return
+            if not line.strip():
+                if line_start >= end:
+                    return
+                break
+    else:
+        f.seek(0)
+
+    lines = []
+    size = 0
+    while True:
+        line_start = f.tell()
+        line = f.readline()
+        if not line:
+            break
+        if not line.strip():
+            if lines:
+                yield "".join(lines)
+                lines, size = [], 0
+            if line_start >= end:
+                return
+            continue
+        text = line.decode('utf-8', errors='replace')
+        lines.append(text)
+        size += len(text)
+        # Bound memory on files that never break into paragraphs
+        if size >= max_section_chars:
+            yield "".join(lines)
+            lines, size = [], 0
+    if lines:
+        yield "".join(lines)
+
+def process_chunk(task: Tuple[str, int, int, int]) -> List[Dict]:
+    """Extract QA pairs from one byte range of a text file (runs in a worker process)"""
+    file_path, start, end, max_section_chars = task
+    qa_pairs = []
+    try:
+        with open(file_path, 'rb') as f:
+            for section in _read_sections(f, start, end, max_section_chars):
+                qa_pair = section_to_qa_pair(section)
+                if qa_pair:
+                    qa_pairs.append(qa_pair)
+    except Exception as e:
+        logging.error(f"Error processing file {file_path}: {str(e)}")
+    return qa_pairs
+
+def file_digest(file_path: str) -> str:
+    sha1 = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+class TextIngestor:
+    """
+    Ingest a folder of medical .txt files into QA pairs across a process pool.
+
+    Files are split into byte-range chunks aligned to section boundaries and
+    streamed line by line, with a bounded number of chunks in flight. Results
+    are yielded in file and chunk order. A manifest of size, mtime and content
+    hash per file lets unchanged files be skipped on later runs.
+    """
+
+    def __init__(
+        self,
+        text_dir: str,
+        manifest_path: str,
+        max_workers: int = None,
+        chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+        max_section_chars: int = DEFAULT_MAX_SECTION_CHARS,
+    ):
+        self.text_dir = text_dir
+        self.manifest_path = manifest_path
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_bytes = chunk_bytes
+        self.max_section_chars = max_section_chars
+
+    def _load_manifest(self) -> Dict:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logging.error(f"Error loading ingestion manifest: {str(e)}")
+            return {}
+
+    def _save_manifest(self, manifest: Dict):
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _changed_files(self, manifest: Dict, executor) -> List[Tuple[str, Dict]]:
+        """List files that are new or modified since the last run, with their new manifest entry"""
+        candidates = []
+        for filename in sorted(os.listdir(self.text_dir)):
+            if not filename.endswith('.txt'):
+                continue
+            file_path = os.path.join(self.text_dir, filename)
+            stat = os.stat(file_path)
+            entry = {"size": stat.st_size, "mtime": stat.st_mtime}
+            previous = manifest.get(filename)
+            if previous and previous['size'] == entry['size'] and previous['mtime'] == entry['mtime']:
+                continue
+            candidates.append((filename, entry))
+
+        # Only hash files whose size or mtime changed; a touched but identical file is still skipped
+        paths = [os.path.join(self.text_dir, filename) for filename, _ in candidates]
+        changed = []
+        for (filename, entry), digest in zip(candidates, executor.map(file_digest, paths)):
+            entry['sha1'] = digest
+            previous = manifest.get(filename)
+            if previous and previous.get('sha1') == digest:
+                manifest[filename] = entry
+                continue
+            changed.append((filename, entry))
+        return changed
+
+    def _chunks(self, file_path: str, size: int) -> List[Tuple[str, int, int, int]]:
+        return [
+            (file_path, start, min(start + self.chunk_bytes, size), self.max_section_chars)
+            for start in range(0, max(size, 1), self.chunk_bytes)
+        ]
+
+    def ingest(self) -> Iterator[Dict]:
+        """Yield QA pairs from new or changed files, updating the manifest as each file completes"""
+        if not os.path.exists(self.text_dir):
+            return
+
+        manifest = self._load_manifest()
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            changed = self._changed_files(manifest, executor)
+            logging.info(f"Ingesting {len(changed)} new or changed text files from {self.text_dir}")
+
+            # Every chunk is tagged with whether it is the last one of its file
+            tasks = (
+                (task, filename, entry, i == len(chunks) - 1)
+                for filename, entry in changed
+                for chunks in [self._chunks(os.path.join(self.text_dir, filename), entry['size'])]
+                for i, task in enumerate(chunks)
+            )
+
+            in_flight = deque()
+            for task, filename, entry, last in tasks:
+                in_flight.append((executor.submit(process_chunk, task), filename, entry, last))
+                if len(in_flight) >= self.max_workers * 2:
+                    yield from self._drain_one(in_flight, manifest)
+            while in_flight:
+                yield from self._drain_one(in_flight, manifest)
+
+        self._save_manifest(manifest)
+
+    def _drain_one(self, in_flight: deque, manifest: Dict) -> Iterator[Dict]:
+        future, filename, entry, last = in_flight.popleft()
+        yield from future.result()
+        if last:
+            manifest[filename] = entry
+            self._save_manifest(manifest)
@@ -1,11 +1,18 @@
 import torch
 from transformers import AutoModelForQuestionAnswering, AutoTokenizer, Trainer, TrainingArguments
-from datasets import load_dataset, Dataset
+from datasets import load_from_disk, Dataset
 import pandas as pd
 import json
+from datetime import datetime
 from typing import List, Dict
 import os
-from sklearn.model_selection import train_test_split
+import sys
+import argparse
+import logging
+from qa_corpus import QACorpus, record_hash
+
+# One in HOLDOUT_MODULUS pairs of the first training run is held out for evaluation
+HOLDOUT_MODULUS = 10
 
 class MedicalDatasetPreparation:
     def __init__(self, data_path: str = "medical_data"):
@@ -43,6 +50,38 @@ class MedicalDatasetPreparation:
 
         return Dataset.from_dict(dataset_dict)
 
+    def prepare_corpus_dataset(self, corpus_dir: str = None):
+        """
+        Load the sharded JSONL corpus as a memory-mapped Arrow dataset, keeping
+        only pairs whose answer occurs in the context
+        """
+        corpus_dir = corpus_dir or os.path.join(self.data_path, 'corpus')
+
+        # Read through QACorpus rather than the raw shards, so only indexed
+        # records are used; from_generator caches them as an Arrow file. The
+        # corpus is append-only, so its length identifies the cached version.
+        def corpus_records(corpus_dir, count):
+            for position, record in enumerate(QACorpus(corpus_dir)):
+                if position == count:
+                    break
+                yield record
+
+        count = len(QACorpus(corpus_dir))
+        dataset = Dataset.from_generator(corpus_records, gen_kwargs={"corpus_dir": corpus_dir, "count": count})
+
+        def add_answer_positions(example):
+            start_pos = example['context'].find(example['answer'])
+            example['start_positions'] = start_pos
+            example['end_positions'] = start_pos + len(example['answer']) if start_pos != -1 else -1
+            return example
+
+        dataset = dataset.map(add_answer_positions)
+        return dataset.filter(lambda example: example['start_positions'] != -1)
+
+    def add_pair_hashes(self, dataset):
+        """Add a pair_hash column identifying each QA pair by its content"""
+        return dataset.map(lambda example: {'pair_hash': record_hash(example)})
+
 class MedicalModelTrainer:
     def __init__(self, model_name: str = "microsoft/BiomedNLP-PubMedBERT-base-uncased-abstract-fulltext"):
         self.model_name = model_name
@@ -105,14 +144,17 @@ class MedicalModelTrainer:
         inputs["end_positions"] = end_positions
         return inputs
 
-    def train(self, train_dataset, eval_dataset, output_dir: str = "medical_qa_model"):
+    def tokenize(self, dataset):
+        return dataset.map(self.preprocess_function, batched=True, remove_columns=dataset.column_names)
+
+    def train(self, train_dataset, eval_dataset, output_dir: str = "medical_qa_model", num_train_epochs: int = 3):
         training_args = TrainingArguments(
             output_dir=output_dir,
             evaluation_strategy="epoch",
             learning_rate=2e-5,
             per_device_train_batch_size=16,
             per_device_eval_batch_size=16,
-            num_train_epochs=3,
+            num_train_epochs=num_train_epochs,
             weight_decay=0.01,
             push_to_hub=False,
         )
@@ -131,28 +173,126 @@ class MedicalModelTrainer:
         self.model.save_pretrained(output_dir)
         self.tokenizer.save_pretrained(output_dir)
 
+        return trainer.evaluate()
+
+class IncrementalTrainingPipeline:
+    """
+    Continual training on top of the last saved checkpoint.
+
+    A manifest in the model directory records the content hash of every pair
+    already trained on and of the holdout set chosen on the first full run.
+    Incremental runs tokenize only pairs that are not in the manifest, resume
+    fine-tuning from the saved model and evaluate on the same cached holdout
+    features, so results stay comparable across runs.
+    """
+
+    def __init__(self, output_dir: str = "medical_qa_model",
+                 base_model: str = "microsoft/BiomedNLP-PubMedBERT-base-uncased-abstract-fulltext"):
+        self.output_dir = output_dir
+        self.base_model = base_model
+        self.manifest_path = os.path.join(output_dir, 'training_manifest.json')
+        self.holdout_path = os.path.join(output_dir, 'holdout_features')
+
+    def has_checkpoint(self) -> bool:
+        return os.path.exists(self.manifest_path) and os.path.exists(os.path.join(self.output_dir, 'config.json'))
+
+    def _load_manifest(self) -> Dict:
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_manifest(self, manifest: Dict):
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def run_full(self, dataset, num_train_epochs: int = 3) -> Dict:
+        """Train from the base model, fixing the holdout set for later incremental runs"""
+        holdout = dataset.filter(lambda example: int(example['pair_hash'][:8], 16) % HOLDOUT_MODULUS == 0)
+        train = dataset.filter(lambda example: int(example['pair_hash'][:8], 16) % HOLDOUT_MODULUS != 0)
+        if len(holdout) == 0 or len(train) == 0:
+            raise ValueError(
+                f"Need enough QA pairs for both a training and a holdout set (1 in {HOLDOUT_MODULUS} "
+                f"is held out), but only {len(dataset)} pairs have their answer in the context"
+            )
+
+        trainer = MedicalModelTrainer(self.base_model)
+
+        holdout_features = trainer.tokenize(holdout)
+        metrics = trainer.train(trainer.tokenize(train), holdout_features, self.output_dir, num_train_epochs)
+        holdout_features.save_to_disk(self.holdout_path)
+
+        manifest = {
+            "base_model": self.base_model,
+            "trained": list(train['pair_hash']),
+            "holdout": list(holdout['pair_hash']),
+            "runs": [],
+        }
+        self._record_run(manifest, "full", len(train), metrics)
+        return metrics
+
+    def run_incremental(self, dataset, num_train_epochs: int = 1) -> Dict:
+        """Fine-tune the saved model on pairs added or changed since the last run"""
+        manifest = self._load_manifest()
+        known = set(manifest['trained']) | set(manifest['holdout'])
+        delta = dataset.filter(lambda example: example['pair_hash'] not in known)
+        if len(delta) == 0:
+            logging.info("No new or changed QA pairs since the last training run")
+            return {}
+
+        trainer = MedicalModelTrainer(self.output_dir)
+        if os.path.exists(self.holdout_path):
+            holdout_features = load_from_disk(self.holdout_path)
+        else:
+            holdout = set(manifest['holdout'])
+            holdout_features = trainer.tokenize(dataset.filter(lambda example: example['pair_hash'] in holdout))
+            holdout_features.save_to_disk(self.holdout_path)
+
+        metrics = trainer.train(trainer.tokenize(delta), holdout_features, self.output_dir, num_train_epochs)
+
+        manifest['trained'].extend(list(delta['pair_hash']))
+        self._record_run(manifest, "incremental", len(delta), metrics)
+        return metrics
+
+    def _record_run(self, manifest: Dict, mode: str, pairs: int, metrics: Dict):
+        manifest['runs'].append({
+            "mode": mode,
+            "pairs": pairs,
+            "finished_at": datetime.utcnow().isoformat(),
+            "eval_loss": metrics.get('eval_loss'),
+        })
+        self._save_manifest(manifest)
+        logging.info(f"{mode.capitalize()} training on {pairs} pairs finished, holdout loss {metrics.get('eval_loss')}")
+
 def main():
-    # Example medical QA pairs
-    medical_qa_pairs = [
-        {
-            "question": "What are the symptoms of diabetes?",
-            "context": "Common symptoms of diabetes include increased thirst, frequent urination, extreme hunger, unexplained weight loss, fatigue, blurred vision, and slow-healing sores.",
-            "answer": "increased thirst, frequent urination, extreme hunger, unexplained weight loss, fatigue, blurred vision, and slow-healing sores"
-        },
-        # Add more medical QA pairs here
-    ]
-
-    # Prepare dataset
+    parser = argparse.ArgumentParser(description="Fine-tune the medical QA model")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Train only on new or changed pairs, resuming from the last checkpoint")
+    parser.add_argument('--output-dir', default="medical_qa_model")
+    args = parser.parse_args()
+
+    # Training data comes from the corpus collected by prepare_medical_data.py
     dataset_prep = MedicalDatasetPreparation()
-    dataset = dataset_prep.prepare_custom_dataset(medical_qa_pairs)
-    
-    # Split dataset
-    train_size = 0.8
-    train_dataset, eval_dataset = train_test_split(dataset, train_size=train_size)
+    if len(QACorpus(os.path.join(dataset_prep.data_path, 'corpus'))) == 0:
+        print(f"No QA corpus found in {os.path.join(dataset_prep.data_path, 'corpus')}. "
+              "Run `python prepare_medical_data.py` first to collect training data.")
+        sys.exit(1)
+    dataset = dataset_prep.prepare_corpus_dataset()
+    dataset = dataset_prep.add_pair_hashes(dataset)
     
-    # Initialize and train model
-    trainer = MedicalModelTrainer()
-    trainer.train(train_dataset, eval_dataset)
+    # Train, incrementally from the last checkpoint when requested and possible
+    pipeline = IncrementalTrainingPipeline(args.output_dir)
+    if args.incremental and pipeline.has_checkpoint():
+        metrics = pipeline.run_incremental(dataset)
+    else:
+        if args.incremental:
+            print("No previous checkpoint found, running a full training")
+        try:
+            metrics = pipeline.run_full(dataset)
+        except ValueError as e:
+            print(f"{e}. Add more data with `python prepare_medical_data.py` and try again.")
+            sys.exit(1)
+    print(f"Holdout metrics: {metrics}")
 
 if __name__ == "__main__":
     main()